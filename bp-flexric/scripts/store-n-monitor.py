@@ -24,17 +24,20 @@ rlc_headers = ['Timestamp', 'TXPDU WT MS', 'TXBUF OCC Bytes', 'RXBUF OCC Bytes',
 pdcp_headers = ['Timestamp', 'RXPDU OO PKTS', 'RXPDU OO Bytes', 'RXPDU DD PKTS', 'RXPDU DD Bytes', 'RXPDU RO Count', 'TXPDU PKTS', 'TXPDU Bytes', 'RXPDU PKTS', 'RXPDU Bytes', 'TXSDU PKTS', 'TXSDU Bytes', 'RXSDU PKTS', 'RXSDU Bytes']
 
 
+# Open CSV files once for the whole run; keyed by file name
+csv_writers = {}
+# Held while writing to them, so they are not closed mid-write
+csv_lock = threading.Lock()
+
 # Initialize CSV files
 def init_csv_files():
-    with open(mac_csv_file, 'w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(mac_headers)
-    with open(rlc_csv_file, 'w', newline='') as file:
+    for csv_file, headers in ((mac_csv_file, mac_headers),
+                              (rlc_csv_file, rlc_headers),
+                              (pdcp_csv_file, pdcp_headers)):
+        file = open(csv_file, 'w', newline='')
         writer = csv.writer(file)
-        writer.writerow(rlc_headers)
-    with open(pdcp_csv_file, 'w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(pdcp_headers)
+        writer.writerow(headers)
+        csv_writers[csv_file] = (file, writer)
 
 init_csv_files()
 
@@ -57,6 +60,7 @@ class MACCallback(ric.mac_cb):
         # Initialize the last reported time
         self.last_report_time = time.time()
         self.stats = []
+        self.lock = threading.Lock()
         
     # Override C++ method: virtual void handle(swig_mac_ind_msg_t a) = 0;
     def handle(self, ind):
@@ -70,21 +74,25 @@ class MACCallback(ric.mac_cb):
             # Print swig_mac_ind_msg_t
             if len(ind.ue_stats) > 0:
 
-                # Collect stats for UE1
-                self.stats.append([
-                    time.time(),
-                    ind.ue_stats[0].rnti,
-                    ind.ue_stats[0].wb_cqi,
-                    ind.ue_stats[0].pusch_snr,
-                    ind.ue_stats[0].ul_bler,
-                    ind.ue_stats[0].dl_bler,
-                    ind.ue_stats[0].ul_mcs1,
-                    ind.ue_stats[0].ul_mcs2,
-                    ind.ue_stats[0].dl_mcs1,
-                    ind.ue_stats[0].dl_mcs2,
-                    ind.ue_stats[0].ul_curr_tbs,
-                    ind.ue_stats[0].dl_curr_tbs
-                ])
+                # Collect stats for UE1 (rows are fixed-size tuples)
+                # Index the SWIG vector once; every [0] builds a new proxy object
+                ue = ind.ue_stats[0]
+                row = (
+                    current_time,
+                    ue.rnti,
+                    ue.wb_cqi,
+                    ue.pusch_snr,
+                    ue.ul_bler,
+                    ue.dl_bler,
+                    ue.ul_mcs1,
+                    ue.ul_mcs2,
+                    ue.dl_mcs1,
+                    ue.dl_mcs2,
+                    ue.ul_curr_tbs,
+                    ue.dl_curr_tbs
+                )
+                with self.lock:
+                    self.stats.append(row)
                 
 
 ####################
@@ -98,6 +106,7 @@ class RLCCallback(ric.rlc_cb):
         ric.rlc_cb.__init__(self)
         super().__init__()
         self.stats = []
+        self.lock = threading.Lock()
         # Initialize the last reported time
         self.last_report_time = time.time()
     # Override C++ method: virtual void handle(swig_rlc_ind_msg_t a) = 0;
@@ -110,20 +119,23 @@ class RLCCallback(ric.rlc_cb):
             if len(ind.rb_stats) > 0:
 
                 # Collect stats for RLC
-                self.stats.append([
-                    time.time(),  # Timestamp
-                    ind.rb_stats[0].txpdu_wt_ms,
-                    ind.rb_stats[0].txbuf_occ_bytes,
-                    ind.rb_stats[0].rxbuf_occ_bytes,
-                    ind.rb_stats[0].txpdu_retx_pkts,
-                    ind.rb_stats[0].rxpdu_dup_pkts,
-                    ind.rb_stats[0].txpdu_dd_pkts,
-                    ind.rb_stats[0].rxpdu_dd_pkts,
-                    ind.rb_stats[0].txpdu_segmented,
-                    ind.rb_stats[0].rxpdu_status_pkts,
-                    ind.rb_stats[0].txsdu_pkts,
-                    ind.rb_stats[0].rxsdu_pkts
-                ])
+                rb = ind.rb_stats[0]
+                row = (
+                    current_time,  # Timestamp
+                    rb.txpdu_wt_ms,
+                    rb.txbuf_occ_bytes,
+                    rb.rxbuf_occ_bytes,
+                    rb.txpdu_retx_pkts,
+                    rb.rxpdu_dup_pkts,
+                    rb.txpdu_dd_pkts,
+                    rb.rxpdu_dd_pkts,
+                    rb.txpdu_segmented,
+                    rb.rxpdu_status_pkts,
+                    rb.txsdu_pkts,
+                    rb.rxsdu_pkts
+                )
+                with self.lock:
+                    self.stats.append(row)
 
 ####################
 #### PDCP INDICATION CALLBACK
@@ -136,6 +148,7 @@ class PDCPCallback(ric.pdcp_cb):
         ric.pdcp_cb.__init__(self)
         super().__init__()
         self.stats = []
+        self.lock = threading.Lock()
         # Initialize the last reported time
         self.last_report_time = time.time()
    # Override C++ method: virtual void handle(swig_pdcp_ind_msg_t a) = 0;
@@ -148,39 +161,63 @@ class PDCPCallback(ric.pdcp_cb):
             if len(ind.rb_stats) > 0:
 
                 # Collect stats for RLC
-                self.stats.append([
-                    time.time(),  # Timestamp
-                    ind.rb_stats[0].rxpdu_oo_pkts,
-                    ind.rb_stats[0].rxpdu_oo_bytes,
-                    ind.rb_stats[0].rxpdu_dd_pkts,
-                    ind.rb_stats[0].rxpdu_dd_bytes,
-                    ind.rb_stats[0].rxpdu_ro_count,
-                    ind.rb_stats[0].txpdu_pkts,
-                    ind.rb_stats[0].txpdu_bytes,
-                    ind.rb_stats[0].rxpdu_pkts,
-                    ind.rb_stats[0].rxpdu_bytes,
-                    ind.rb_stats[0].txsdu_pkts,
-                    ind.rb_stats[0].txsdu_bytes,
-                    ind.rb_stats[0].rxsdu_pkts,
-                    ind.rb_stats[0].rxsdu_bytes
-                ])
+                rb = ind.rb_stats[0]
+                row = (
+                    current_time,  # Timestamp
+                    rb.rxpdu_oo_pkts,
+                    rb.rxpdu_oo_bytes,
+                    rb.rxpdu_dd_pkts,
+                    rb.rxpdu_dd_bytes,
+                    rb.rxpdu_ro_count,
+                    rb.txpdu_pkts,
+                    rb.txpdu_bytes,
+                    rb.rxpdu_pkts,
+                    rb.rxpdu_bytes,
+                    rb.txsdu_pkts,
+                    rb.txsdu_bytes,
+                    rb.rxsdu_pkts,
+                    rb.rxsdu_bytes
+                )
+                with self.lock:
+                    self.stats.append(row)
 
 
 # Function to write stats to CSV
 def write_stats_to_csv(callback, csv_file, headers):
-    with open(csv_file, 'a', newline='') as file:
-        writer = csv.writer(file)
-        for row in callback.stats:
-            writer.writerow(row)
-    callback.stats.clear()
-
-
-def periodic_write():
+    # Reuse the open file and flush once per batch instead of reopening it
+    file, writer = csv_writers[csv_file]
+    # Swap in a fresh list rather than clear() after writing, so rows the
+    # callback thread appends meanwhile are kept for the next batch. The
+    # lock stops an append landing in the old list after it was written.
+    with callback.lock:
+        stats, callback.stats = callback.stats, []
+    writer.writerows(stats)
+    file.flush()
+
+
+def write_all_stats():
     write_stats_to_csv(mac_cb, mac_csv_file, mac_headers)
     write_stats_to_csv(rlc_cb, rlc_csv_file, rlc_headers)
     write_stats_to_csv(pdcp_cb, pdcp_csv_file, pdcp_headers)
+
+
+def periodic_write():
+    with csv_lock:
+        if not csv_writers:  # closed at shutdown
+            return
+        write_all_stats()
     threading.Timer(10, periodic_write).start()
 
+
+# Write out the rows buffered since the last periodic write and close the
+# CSV files, so nothing is lost at exit
+def close_csv_files():
+    with csv_lock:
+        write_all_stats()
+        for file, writer in csv_writers.values():
+            file.close()
+        csv_writers.clear()
+
 ####################
 #### GTP INDICATION CALLBACK
 ####################
@@ -273,7 +310,10 @@ if __name__ == '__main__':
         ric.rm_report_gtp_sm(gtp_hndlr[i])
 
     # Avoid deadlock. ToDo revise architecture
-    while ric.try_stop == 0:
+    # try_stop() returns False while the xApp still has pending work
+    while not ric.try_stop():
         time.sleep(1)
 
+    close_csv_files()
+
     print("Test finished")
\ No newline at end of file
@@ -10,8 +10,61 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+import warnings
 from datetime import datetime
 
+try:
+    import pyarrow  # noqa: F401  multi-threaded CSV reader for pandas
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# Column types as written by xapp_kpm_metrics_collector_v2 (write_csv_header).
+# Declaring them lets the C parser convert each column in a single pass
+# instead of inferring types. Integer columns are nullable so a row truncated
+# by the collector being killed does not abort the load.
+INT_COLS = [
+    'timestamp', 'rnti', 'cqi', 'dl_mcs1', 'dl_mcs2', 'ul_mcs1', 'ul_mcs2',
+    'dl_tbs', 'ul_tbs', 'dl_aggr_tbs', 'ul_aggr_tbs',
+    'dl_prb', 'ul_prb', 'dl_sched_rb', 'ul_sched_rb',
+    'bsr', 'phr', 'frame', 'slot',
+    'rlc_tx_pkts', 'rlc_tx_bytes', 'rlc_rx_pkts', 'rlc_rx_bytes',
+    'rlc_txbuf', 'rlc_rxbuf', 'rlc_retx',
+    'pdcp_tx_pkts', 'pdcp_tx_bytes', 'pdcp_rx_pkts', 'pdcp_rx_bytes',
+    'pdcp_vol_dl_kb', 'pdcp_vol_ul_kb', 'prb_tot_dl', 'prb_tot_ul',
+]
+FLOAT_COLS = [
+    'pusch_snr', 'pucch_snr', 'dl_bler', 'ul_bler',
+    'dl_thp_kbps', 'ul_thp_kbps', 'rlc_sdu_delay_us',
+]
+# Bounded radio indices fit narrow integers. pandas wraps out-of-range
+# values silently, so each type is signed and wider than the C field: a -1
+# sentinel or malformed value is kept as-is rather than wrapped. RNTI
+# (uint32_t), counters and byte totals stay 64-bit. The float metrics are
+# reported to a few decimals, so float32 halves their memory without losing
+# precision.
+NARROW_INT_DTYPES = {
+    'cqi': 'Int16', 'dl_mcs1': 'Int16', 'dl_mcs2': 'Int16',
+    'ul_mcs1': 'Int16', 'ul_mcs2': 'Int16', 'phr': 'Int16',
+    'frame': 'Int32', 'slot': 'Int32',
+}
+CSV_DTYPES = {
+    **{c: NARROW_INT_DTYPES.get(c, 'Int64') for c in INT_COLS},
+    **{c: 'float32' for c in FLOAT_COLS},
+}
+
+
+def counter_increments(series):
+    """Sample-to-sample increments of a counter column, dropping rollovers."""
+    diff = np.diff(series.to_numpy(dtype=np.float64, na_value=np.nan))
+    return diff[diff >= 0]  # NaN compares False, so gaps are dropped too
+
+
+def to_float(value):
+    """Result of reducing a nullable Int column as a float; pd.NA becomes NaN."""
+    return np.nan if pd.isna(value) else float(value)
+
+
 def analyze_dataset(csv_path):
     """Analyze the collected KPM metrics dataset."""
     
@@ -20,13 +73,17 @@ def analyze_dataset(csv_path):
     print("="*60)
     
     # Load data
-    df = pd.read_csv(csv_path)
+    try:
+        df = pd.read_csv(csv_path, dtype=CSV_DTYPES, engine=CSV_ENGINE)
+    except pd.errors.ParserError:
+        # pyarrow rejects a truncated last row; the C parser pads it with NaN
+        df = pd.read_csv(csv_path, dtype=CSV_DTYPES)
     print(f"\n📁 Dataset: {csv_path}")
     print(f"📊 Shape: {df.shape[0]} samples × {df.shape[1]} features")
     
     # Time analysis
     if 'timestamp' in df.columns:
-        duration_us = df['timestamp'].max() - df['timestamp'].min()
+        duration_us = to_float(df['timestamp'].max()) - to_float(df['timestamp'].min())
         duration_s = duration_us / 1e6
         sample_rate = df.shape[0] / duration_s if duration_s > 0 else 0
         print(f"⏱️  Duration: {duration_s:.2f} seconds")
@@ -45,15 +102,24 @@ def analyze_dataset(csv_path):
         'ul_bler': ('UL BLER', '%', 'Uplink Block Error Rate'),
     }
     
-    for col, (name, unit, desc) in signal_metrics.items():
-        if col in df.columns:
-            val = df[col].mean()
-            std = df[col].std()
-            if 'bler' in col:
-                val *= 100  # Convert to percentage
-                std *= 100
-            print(f"  {name}: {val:.2f} ± {std:.2f} {unit}")
-            print(f"    → {desc}")
+    # Reduce all present signal columns in one NumPy pass
+    signal_cols = [col for col in signal_metrics if col in df.columns]
+    signal_vals = df[signal_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+    # Empty or single-sample columns give NaN, as pandas does, without the
+    # RuntimeWarnings NumPy emits for them
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        means = np.nanmean(signal_vals, axis=0)
+        stds = np.nanstd(signal_vals, axis=0, ddof=1)
+    col_means = dict(zip(signal_cols, means))
+
+    for col, val, std in zip(signal_cols, means, stds):
+        name, unit, desc = signal_metrics[col]
+        if 'bler' in col:
+            val *= 100  # Convert to percentage
+            std *= 100
+        print(f"  {name}: {val:.2f} ± {std:.2f} {unit}")
+        print(f"    → {desc}")
     
     # MCS and Modulation
     print("\n" + "-"*60)
@@ -63,7 +129,8 @@ def analyze_dataset(csv_path):
     mcs_metrics = ['dl_mcs1', 'dl_mcs2', 'ul_mcs1', 'ul_mcs2']
     for col in mcs_metrics:
         if col in df.columns:
-            val = df[col].mean()
+            val = to_float(df[col].mean())
+            col_means[col] = val
             direction = 'Downlink' if 'dl' in col else 'Uplink'
             cw = col[-1]
             mod = "QPSK" if val < 10 else ("16QAM" if val < 17 else "64QAM")
@@ -78,8 +145,7 @@ def analyze_dataset(csv_path):
         aggr_col = f'{direction}_aggr_tbs'
         if aggr_col in df.columns:
             # Calculate throughput from aggregated TBS
-            tbs_diff = df[aggr_col].diff().dropna()
-            tbs_diff = tbs_diff[tbs_diff >= 0]  # Remove negative diffs (rollover)
+            tbs_diff = counter_increments(df[aggr_col])
             if len(tbs_diff) > 0:
                 avg_tbs_per_sample = tbs_diff.mean()
                 throughput_kbps = avg_tbs_per_sample * sample_rate * 8 / 1000
@@ -96,13 +162,12 @@ def analyze_dataset(csv_path):
         prb_col = f'{direction}_prb'
         sched_col = f'{direction}_sched_rb'
         if prb_col in df.columns:
-            prb_diff = df[prb_col].diff().dropna()
-            prb_diff = prb_diff[prb_diff >= 0]
+            prb_diff = counter_increments(df[prb_col])
             avg_prb = prb_diff.mean() if len(prb_diff) > 0 else 0
             dir_name = 'Downlink' if direction == 'dl' else 'Uplink'
             print(f"  {dir_name} PRBs/sample: {avg_prb:.2f}")
         if sched_col in df.columns:
-            print(f"    Scheduled RBs: {df[sched_col].mean():.2f}")
+            print(f"    Scheduled RBs: {to_float(df[sched_col].mean()):.2f}")
     
     # RLC Layer
     print("\n" + "-"*60)
@@ -112,9 +177,10 @@ def analyze_dataset(csv_path):
     if 'rlc_tx_pkts' in df.columns and 'rlc_retx' in df.columns:
         total_tx = df['rlc_tx_pkts'].max()
         total_retx = df['rlc_retx'].max()
-        retx_rate = (total_retx / total_tx * 100) if total_tx > 0 else 0
-        print(f"  TX Packets: {total_tx}")
-        print(f"  Retransmissions: {total_retx}")
+        tx, retx = to_float(total_tx), to_float(total_retx)
+        retx_rate = (retx / tx * 100) if tx > 0 else 0
+        print(f"  TX Packets: {tx:.0f}")
+        print(f"  Retransmissions: {retx:.0f}")
         print(f"  Retx Rate: {retx_rate:.2f}%")
         
         if retx_rate < 1:
@@ -128,7 +194,7 @@ def analyze_dataset(csv_path):
         print(f"    → Link Quality: {quality}")
     
     if 'rlc_txbuf' in df.columns:
-        print(f"  TX Buffer: {df['rlc_txbuf'].mean():.0f} bytes avg")
+        print(f"  TX Buffer: {to_float(df['rlc_txbuf'].mean()):.0f} bytes avg")
     
     # PDCP Layer
     print("\n" + "-"*60)
@@ -139,10 +205,10 @@ def analyze_dataset(csv_path):
         pkts_col = f'pdcp_{direction}_pkts'
         bytes_col = f'pdcp_{direction}_bytes'
         if pkts_col in df.columns:
-            total_pkts = df[pkts_col].max()
-            total_bytes = df[bytes_col].max() if bytes_col in df.columns else 0
+            total_pkts = to_float(df[pkts_col].max())
+            total_bytes = to_float(df[bytes_col].max()) if bytes_col in df.columns else 0
             dir_name = 'Transmitted' if direction == 'tx' else 'Received'
-            print(f"  {dir_name}: {total_pkts} packets, {total_bytes} bytes")
+            print(f"  {dir_name}: {total_pkts:.0f} packets, {total_bytes:.0f} bytes")
     
     # Data Quality Assessment
     print("\n" + "-"*60)
@@ -150,13 +216,10 @@ def analyze_dataset(csv_path):
     print("-"*60)
     
     # Check for constant values (potential issues)
-    constant_cols = []
-    varying_cols = []
-    for col in df.columns:
-        if df[col].nunique() == 1:
-            constant_cols.append(col)
-        else:
-            varying_cols.append(col)
+    # Count distinct values for every column in a single pass
+    nunique = df.nunique()
+    constant_cols = nunique.index[nunique == 1].tolist()
+    varying_cols = nunique.index[nunique != 1].tolist()
     
     print(f"  Varying metrics: {len(varying_cols)}/{len(df.columns)}")
     print(f"  Constant metrics: {len(constant_cols)}")
@@ -173,9 +236,10 @@ def analyze_dataset(csv_path):
     print("📚 INTERPRETATION GUIDE")
     print("="*60)
     
-    snr = df['pusch_snr'].mean() if 'pusch_snr' in df.columns else 0
-    bler = df['dl_bler'].mean() * 100 if 'dl_bler' in df.columns else 0
-    mcs = df['dl_mcs1'].mean() if 'dl_mcs1' in df.columns else 0
+    # Reuse the means computed above instead of re-scanning the columns
+    snr = col_means.get('pusch_snr', 0)
+    bler = col_means.get('dl_bler', 0) * 100
+    mcs = col_means.get('dl_mcs1', 0)
     
     print(f"""
   📡 Signal Quality (SNR = {snr:.1f} dB):
@@ -1,96 +1,119 @@
 import pandas as pd
+import numpy as np
 import re
 import sys
 import os
 import argparse
 from datetime import datetime
 
+# DL SINR estimate by DL BLER bucket: < 0.001, < 0.01, < 0.1, otherwise
+BLER_EDGES = np.array([0.001, 0.01, 0.1])
+SINR_VALUES = np.array([25.0, 20.0, 15.0, 10.0])
+
+# gNB log fields copied onto each xApp row as log_<field>
+LOG_FIELDS = ['rsrp', 'ph', 'pcmax', 'sync', 'harq_dl', 'harq_ul', 'dlsch_err', 'ulsch_err']
+FRAME_WRAP = 1024  # NR frame numbers run 0..1023
+LOOKBACK_FRAMES = 200  # how far back a row may be matched to a log frame
+
+# Output column order of the merged dataset; other columns follow in CSV order
+DESIRED_ORDER = [
+    # ID & Time
+    'timestamp', 'frame', 'slot', 'rnti', 'log_sync', 'amf_state', 'smf_pdu_status',
+    
+    # Radio Quality
+    'log_rsrp', 'est_rsrq', 'est_sinr_dl', 'pusch_snr', 'pucch_snr', 'cqi', 'log_ph', 'log_pcmax',
+    
+    # Throughput & Load
+    'dl_thp_kbps', 'ul_thp_kbps', 'prb_tot_dl', 'prb_tot_ul', 'dl_prb', 'ul_prb', 'smf_pdu_sessions',
+    
+    # Errors & Reliability
+    'dl_bler', 'ul_bler', 'log_dlsch_err', 'log_ulsch_err', 'log_harq_dl', 'log_harq_ul', 'rlc_retx',
+    'amf_auth_events',
+
+    # MCS & TBS
+    'dl_mcs1', 'ul_mcs1', 'dl_tbs', 'ul_tbs',
+    
+    # Latency & Buffers
+    'rlc_sdu_delay_us', 'rlc_txbuf', 'bsr'
+]
+DESIRED_COLUMNS = set(DESIRED_ORDER)
+
+# gNB log patterns, compiled once at import (the log is ASCII)
+# [NR_MAC] I Frame.Slot 512.0
+FRAME_PAT = re.compile(r"Frame\.Slot\s+(\d+)\.(\d+)", re.ASCII)
+
+# UE RNTI 1d6d ... PH 0 dB PCMAX 0 dBm ...
+UE_STATS_PAT = re.compile(r"UE RNTI [0-9a-fA-F]+.*?(in-sync|out-of-sync).*?PH.*?(-?\d+)\s*dB.*?PCMAX.*?(-?\d+)\s*dBm.*?average RSRP (-?\d+)", re.ASCII)
+
+# UE 1d6d: dlsch_rounds 355767/1/0/0, dlsch_errors 0, ...
+DLSCH_PAT = re.compile(r"UE [0-9a-fA-F]+: dlsch_rounds \d+/(\d+)/(\d+)/(\d+), dlsch_errors (\d+)", re.ASCII)
+
+# UE 1d6d: ulsch_rounds 554388/88/36/3, ulsch_errors 1, ...
+ULSCH_PAT = re.compile(r"UE [0-9a-fA-F]+: ulsch_rounds \d+/(\d+)/(\d+)/(\d+), ulsch_errors (\d+)", re.ASCII)
+
 def parse_gnb_logs(log_file):
     """
-    Parses gNB logs to extract RSRP mapped by Frame/Slot.
-    Returns a dict: {(frame, slot, rnti): {'rsrp': value, 'ph': value}}
+    Parses gNB logs to extract RSRP mapped by Frame.
+    Returns a dict: {frame: {'rsrp': value, 'ph': value}}
+    A frame's entry holds the stats of the last slot that logged any; stats
+    from another slot replace it. Stats of several RNTIs in the same slot are
+    merged, later lines overwriting earlier ones.
     """
     metrics = {}
+    entry_slots = {}  # frame -> slot whose stats metrics[frame] holds
     current_frame = None
     current_slot = None
-    
-    # Regex patterns
-    # [NR_MAC] I Frame.Slot 512.0
-    frame_pat = re.compile(r"Frame\.Slot\s+(\d+)\.(\d+)")
-    
-    # UE RNTI 1d6d ... PH 0 dB PCMAX 0 dBm ...
-    ue_stats_pat = re.compile(r"UE RNTI ([0-9a-fA-F]+).*?(in-sync|out-of-sync).*?PH.*?(-?\d+)\s*dB.*?PCMAX.*?(-?\d+)\s*dBm.*?average RSRP (-?\d+)")
-
-    # UE 1d6d: dlsch_rounds 355767/1/0/0, dlsch_errors 0, ...
-    dlsch_pat = re.compile(r"UE ([0-9a-fA-F]+): dlsch_rounds (\d+)/(\d+)/(\d+)/(\d+), dlsch_errors (\d+)")
-    
-    # UE 1d6d: ulsch_rounds 554388/88/36/3, ulsch_errors 1, ...
-    ulsch_pat = re.compile(r"UE ([0-9a-fA-F]+): ulsch_rounds (\d+)/(\d+)/(\d+)/(\d+), ulsch_errors (\d+)")
-
-    current_rnti = None
 
     try:
         with open(log_file, 'r') as f:
             for line in f:
-                # 1. Check Frame/Slot context
-                m_frame = frame_pat.search(line)
+                # 1. Check Frame/Slot context. Substring checks gate every
+                # regex, since most gNB log lines match none of them.
+                m_frame = 'Frame.Slot' in line and FRAME_PAT.search(line)
                 if m_frame:
                     current_frame = int(m_frame.group(1))
-                    current_slot = int(m_frame.group(2))
+                    current_slot = m_frame.group(2)
                     continue
                 
                 if current_frame is not None:
                     # 2. Check UE Main Stats (RSRP, PH, Sync)
-                    m_stat = ue_stats_pat.search(line)
+                    m_stat = 'UE RNTI' in line and UE_STATS_PAT.search(line)
                     if m_stat:
-                        rnti_hex = m_stat.group(1)
-                        current_rnti = int(rnti_hex, 16)
-                        
-                        sync = m_stat.group(2)
-                        ph = int(m_stat.group(3))
-                        pcmax = int(m_stat.group(4))
-                        rsrp = int(m_stat.group(5))
+                        sync = m_stat.group(1)
+                        ph = int(m_stat.group(2))
+                        pcmax = int(m_stat.group(3))
+                        rsrp = int(m_stat.group(4))
                         
-                        key = (current_frame, current_slot, current_rnti)
-                        if key not in metrics: metrics[key] = {}
-                        metrics[key].update({
+                        if entry_slots.get(current_frame) != current_slot:
+                            metrics[current_frame], entry_slots[current_frame] = {}, current_slot
+                        metrics[current_frame].update({
                             'rsrp': rsrp, 'ph': ph, 'pcmax': pcmax, 'sync': sync
                         })
                         continue
 
                     # 3. Check DLSCH (HARQ DL)
-                    m_dl = dlsch_pat.search(line)
+                    m_dl = 'dlsch_rounds' in line and DLSCH_PAT.search(line)
                     if m_dl:
-                        # Ensure we are attributing to correct UE. 
-                        # Log format: "UE <rnti>: ..."
-                        rnti_hex = m_dl.group(1)
-                        rnti = int(rnti_hex, 16)
-                        
                         # Rounds: r0, r1, r2, r3. Retx = r1+r2+r3
-                        rounds = [int(m_dl.group(i)) for i in range(2, 6)]
-                        harq_dl = sum(rounds[1:])
-                        dlsch_err = int(m_dl.group(6))
+                        harq_dl = int(m_dl.group(1)) + int(m_dl.group(2)) + int(m_dl.group(3))
+                        dlsch_err = int(m_dl.group(4))
                         
-                        key = (current_frame, current_slot, rnti)
-                        if key not in metrics: metrics[key] = {}
-                        metrics[key].update({
+                        if entry_slots.get(current_frame) != current_slot:
+                            metrics[current_frame], entry_slots[current_frame] = {}, current_slot
+                        metrics[current_frame].update({
                             'harq_dl': harq_dl, 'dlsch_err': dlsch_err
                         })
                         continue
 
                     # 4. Check ULSCH (HARQ UL)
-                    m_ul = ulsch_pat.search(line)
+                    m_ul = 'ulsch_rounds' in line and ULSCH_PAT.search(line)
                     if m_ul:
-                        rnti_hex = m_ul.group(1)
-                        rnti = int(rnti_hex, 16)
-                        
-                        rounds = [int(m_ul.group(i)) for i in range(2, 6)]
-                        harq_ul = sum(rounds[1:])
-                        ulsch_err = int(m_ul.group(6))
+                        harq_ul = int(m_ul.group(1)) + int(m_ul.group(2)) + int(m_ul.group(3))
+                        ulsch_err = int(m_ul.group(4))
                         
-                        key = (current_frame, current_slot, rnti)
-                        if key not in metrics: metrics[key] = {}
-                        metrics[key].update({
+                        if entry_slots.get(current_frame) != current_slot:
+                            metrics[current_frame], entry_slots[current_frame] = {}, current_slot
+                        metrics[current_frame].update({
                             'harq_ul': harq_ul, 'ulsch_err': ulsch_err
                         })
                         continue
@@ -156,8 +179,8 @@ def merge_data(csv_file, log_file, output_file, amf_log=None, smf_log=None, upf_
         return
 
     # 2. Parse gNB Logs
-    log_metrics = parse_gnb_logs(log_file)
-    print(f"[INFO] Extracted {len(log_metrics)} gNB log data points.")
+    log_map = parse_gnb_logs(log_file)
+    print(f"[INFO] Extracted {len(log_map)} gNB log frames.")
     
     # 3. Parse CN Logs
     amf_stats = parse_cn_logs(amf_log, 'AMF')
@@ -168,97 +191,43 @@ def merge_data(csv_file, log_file, output_file, amf_log=None, smf_log=None, upf_
 
     # 3. Merge gNB Data (Lookback)
     # Logs are sparse (e.g. every 128 slots). xApp is frequent (every 10ms).
-    log_map = {}
-    for (f, s, r), data in log_metrics.items():
-        log_map[f] = data
-        
-    rsrp_list = []
-    ph_list = []
-    pcmax_list = []
-    sync_list = []
-    harq_dl_list = []
-    harq_ul_list = []
-    dlsch_err_list = []
-    ulsch_err_list = []
+    log_df = pd.DataFrame.from_dict(log_map, orient='index', columns=LOG_FIELDS)
+    log_df.index = log_df.index.astype(np.int64)
     
-    rsrq_list = []
-    sinr_dl_list = []
+    # Dense table: for each of the 1024 frame numbers, the latest log frame
+    # at most LOOKBACK_FRAMES - 1 frames earlier, or -1. Frames wrap, so the
+    # log frames are laid out over two cycles and the second one is read.
+    log_frames = log_df.index[log_df.index < FRAME_WRAP].to_numpy()
+    latest = np.full(2 * FRAME_WRAP, -1)
+    latest[log_frames] = log_frames
+    latest[log_frames + FRAME_WRAP] = log_frames + FRAME_WRAP
+    latest = np.maximum.accumulate(latest)[FRAME_WRAP:]
+    in_reach = (latest >= 0) & (np.arange(FRAME_WRAP, 2 * FRAME_WRAP) - latest < LOOKBACK_FRAMES)
+    nearest = np.where(in_reach, latest % FRAME_WRAP, -1)
     
-    for index, row in df.iterrows():
-        # 1. Fill from Logs (Lookback)
-        try:
-            current_f = int(row['frame'])
-            match = None
-            for offset in range(200):
-                check_f = (current_f - offset) % 1024
-                if check_f in log_map:
-                    match = log_map[check_f]
-                    break
-            
-            if match:
-                rsrp = match.get('rsrp')
-                ph = match.get('ph')
-                pcmax = match.get('pcmax')
-                sync = match.get('sync')
-                harq_dl = match.get('harq_dl')
-                harq_ul = match.get('harq_ul')
-                dlsch_err = match.get('dlsch_err')
-                ulsch_err = match.get('ulsch_err')
-                
-                rsrp_list.append(rsrp)
-                ph_list.append(ph)
-                pcmax_list.append(pcmax)
-                sync_list.append(sync)
-                harq_dl_list.append(harq_dl)
-                harq_ul_list.append(harq_ul)
-                dlsch_err_list.append(dlsch_err)
-                ulsch_err_list.append(ulsch_err)
-                
-                # Estimate RSRQ: RSRP + 100 - 90 (from reference script)
-                if rsrp is not None:
-                    rsrq_list.append(rsrp + 10.0)
-                else:
-                    rsrq_list.append(None)
-            else:
-                rsrp_list.append(None)
-                ph_list.append(None)
-                pcmax_list.append(None)
-                sync_list.append(None)
-                harq_dl_list.append(None)
-                harq_ul_list.append(None)
-                dlsch_err_list.append(None)
-                ulsch_err_list.append(None)
-                rsrq_list.append(None)
-                
-        except Exception:
-            rsrp_list.append(None)
-            # ... fill Nones for others ...
-            ph_list.append(None); pcmax_list.append(None); sync_list.append(None)
-            harq_dl_list.append(None); harq_ul_list.append(None)
-            dlsch_err_list.append(None); ulsch_err_list.append(None)
-            rsrq_list.append(None)
-
-        # 2. Estimate DL SINR from DL BLER (xApp data)
-        try:
-            bler = float(row['dl_bler'])
-            if bler < 0.001: sinr_dl_list.append(25.0)
-            elif bler < 0.01: sinr_dl_list.append(20.0)
-            elif bler < 0.1: sinr_dl_list.append(15.0)
-            else: sinr_dl_list.append(10.0)
-        except Exception:
-            sinr_dl_list.append(None)
-
-    df['log_rsrp'] = rsrp_list
-    df['log_ph'] = ph_list
-    df['log_pcmax'] = pcmax_list
-    df['log_sync'] = sync_list
-    df['log_harq_dl'] = harq_dl_list
-    df['log_harq_ul'] = harq_ul_list
-    df['log_dlsch_err'] = dlsch_err_list
-    df['log_ulsch_err'] = ulsch_err_list
+    if 'frame' in df.columns:
+        frames = pd.to_numeric(df['frame'], errors='coerce').to_numpy(dtype=np.float64)
+    else:
+        frames = np.full(len(df), np.nan)
+    valid = np.isfinite(frames)  # rows without a frame get no log data
+    row_log_frames = np.full(len(df), -1)
+    row_log_frames[valid] = nearest[np.trunc(frames[valid]).astype(np.int64) % FRAME_WRAP]
+    matched = log_df.reindex(row_log_frames)  # -1 is not a frame: all-NaN row
+    
+    for field in LOG_FIELDS:
+        values = matched[field]
+        if values.dtype == np.float64 and not values.isna().any():
+            values = values.astype(np.int64)  # log counters are integers
+        df[f'log_{field}'] = values.to_numpy()
     
-    df['est_rsrq'] = rsrq_list
-    df['est_sinr_dl'] = sinr_dl_list
+    # Estimate RSRQ: RSRP + 100 - 90 (from reference script)
+    df['est_rsrq'] = matched['rsrp'].to_numpy(dtype=np.float64) + 10.0
+    # Estimate DL SINR from DL BLER (xApp data) for the whole column at once
+    if 'dl_bler' in df.columns:
+        bler = pd.to_numeric(df['dl_bler'], errors='coerce').to_numpy()
+        df['est_sinr_dl'] = SINR_VALUES[np.searchsorted(BLER_EDGES, bler, side='right')]
+    else:
+        df['est_sinr_dl'] = None
 
     # 4. Add CN Columns (Duplicate Global State across all rows)
     # Since these are slow-changing/event-based, we just apply the experiment state
@@ -269,32 +238,9 @@ def merge_data(csv_file, log_file, output_file, amf_log=None, smf_log=None, upf_
 
 
     # 5. Reorder Columns
-    desired_order = [
-        # ID & Time
-        'timestamp', 'frame', 'slot', 'rnti', 'log_sync', 'amf_state', 'smf_pdu_status',
-        
-        # Radio Quality
-        'log_rsrp', 'est_rsrq', 'est_sinr_dl', 'pusch_snr', 'pucch_snr', 'cqi', 'log_ph', 'log_pcmax',
-        
-        # Throughput & Load
-        'dl_thp_kbps', 'ul_thp_kbps', 'prb_tot_dl', 'prb_tot_ul', 'dl_prb', 'ul_prb', 'smf_pdu_sessions',
-        
-        # Errors & Reliability
-        'dl_bler', 'ul_bler', 'log_dlsch_err', 'log_ulsch_err', 'log_harq_dl', 'log_harq_ul', 'rlc_retx',
-        'amf_auth_events',
-
-        # MCS & TBS
-        'dl_mcs1', 'ul_mcs1', 'dl_tbs', 'ul_tbs',
-        
-        # Latency & Buffers
-        'rlc_sdu_delay_us', 'rlc_txbuf', 'bsr'
-    ]
-    
-    # Get all existing columns
-    existing_cols = df.columns.tolist()
-    final_order = [c for c in desired_order if c in existing_cols]
-    remaining = [c for c in existing_cols if c not in final_order]
-    final_order.extend(remaining)
+    present = set(df.columns)
+    final_order = [c for c in DESIRED_ORDER if c in present]
+    final_order += [c for c in df.columns if c not in DESIRED_COLUMNS]
     
     df = df[final_order]
 
@@ -18,9 +18,14 @@ echo ""
 # 1. Infrastructure Checks
 # ------------------------------------------------------------------
 echo "[INFO] Checking infrastructure..."
-UE_POD=$(kubectl get pods -n $NAMESPACE -l app.kubernetes.io/name=oai-nr-ue -o jsonpath='{.items[0].metadata.name}' 2>/dev/null)
-UPF_POD=$(kubectl get pods -n $NAMESPACE -l app.kubernetes.io/name=oai-upf -o jsonpath='{.items[0].metadata.name}' 2>/dev/null)
-FLEXRIC_POD=$(kubectl get pods -n $NAMESPACE -l app.kubernetes.io/name=oai-flexric -o jsonpath='{.items[0].metadata.name}' 2>/dev/null)
+# List "<app name> <pod name>" for every pod once, instead of one kubectl call per pod
+PODS=$(kubectl get pods -n $NAMESPACE -o jsonpath='{range .items[*]}{.metadata.labels.app\.kubernetes\.io/name}{" "}{.metadata.name}{"\n"}{end}' 2>/dev/null)
+pod_for() {
+    echo "$PODS" | awk -v app="$1" '$1 == app { print $2; exit }'
+}
+UE_POD=$(pod_for oai-nr-ue)
+UPF_POD=$(pod_for oai-upf)
+FLEXRIC_POD=$(pod_for oai-flexric)
 
 if [[ -z "$UE_POD" || -z "$UPF_POD" || -z "$FLEXRIC_POD" ]]; then
     echo "[ERROR] Pods not found. Is the network deployed?"
@@ -116,9 +121,9 @@ FINAL_FILE="$DATA_DIR/dataset_full_${TIMESTAMP}.csv"
 
 # Start Log Capture
 echo "[INFO] Capturing gNB and Core Network logs..."
-GNB_POD=$(kubectl get pods -n $NAMESPACE -l app.kubernetes.io/name=oai-gnb -o jsonpath='{.items[0].metadata.name}' 2>/dev/null)
-AMF_POD=$(kubectl get pods -n $NAMESPACE -l app.kubernetes.io/name=oai-amf -o jsonpath='{.items[0].metadata.name}' 2>/dev/null)
-SMF_POD=$(kubectl get pods -n $NAMESPACE -l app.kubernetes.io/name=oai-smf -o jsonpath='{.items[0].metadata.name}' 2>/dev/null)
+GNB_POD=$(pod_for oai-gnb)
+AMF_POD=$(pod_for oai-amf)
+SMF_POD=$(pod_for oai-smf)
 # UPF_POD is already defined at start
 
 # Define CN Log Files
@@ -14,6 +14,7 @@ import time
 import sys
 import signal
 import os
+import select
 from datetime import datetime
 from collections import defaultdict
 
@@ -21,12 +22,46 @@ from collections import defaultdict
 XAPP_BINARY = "/flexric/build/examples/xApp/c/monitor/xapp_kpm_moni"
 OUTPUT_DIR = "/tmp/kpm_dataset"
 COLLECTION_DURATION = 300  # 5 minutes default
+READ_CHUNK_SIZE = 65536  # bytes read from the xApp pipe per wakeup
+POLL_INTERVAL = 0.5  # max seconds to wait for xApp output before re-checking stop
+FLUSH_EVERY = 64  # records buffered between flushes; the rest is flushed on close
+
+# Output patterns of xapp_kpm_moni, compiled once (the output is ASCII)
+KPM_HEADER_PATTERN = re.compile(r'\s*(\d+)\s+KPM ind_msg latency = (\d+)', re.ASCII)
+UE_ID_PATTERN = re.compile(r'UE ID type = .*, amf_ue_ngap_id = (\d+)', re.ASCII)
+# All KPIs in one alternation; the named group that matched is the field
+METRIC_PATTERN = re.compile(
+    r'DRB\.PdcpSduVolumeDL = (?P<pdcp_sdu_volume_dl_kb>\d+)'
+    r'|DRB\.PdcpSduVolumeUL = (?P<pdcp_sdu_volume_ul_kb>\d+)'
+    r'|DRB\.RlcSduDelayDl = (?P<rlc_sdu_delay_dl_us>[\d.]+)'
+    r'|DRB\.UEThpDl = (?P<ue_throughput_dl_kbps>[\d.]+)'
+    r'|DRB\.UEThpUl = (?P<ue_throughput_ul_kbps>[\d.]+)'
+    r'|RRU\.PrbTotDl = (?P<prb_total_dl>\d+)'
+    r'|RRU\.PrbTotUl = (?P<prb_total_ul>\d+)',
+    re.ASCII
+)
+
+# CSV columns, in order; missing fields are written as 0
+CSV_FIELDS = [
+    'sample_id', 'timestamp', 'latency_us', 'ue_id',
+    'pdcp_sdu_volume_dl_kb', 'pdcp_sdu_volume_ul_kb',
+    'rlc_sdu_delay_dl_us', 'ue_throughput_dl_kbps',
+    'ue_throughput_ul_kbps', 'prb_total_dl', 'prb_total_ul'
+]
+
+# Fields aggregated in memory for the end-of-run summary
+SUMMARY_FIELDS = ('ue_throughput_dl_kbps', 'ue_throughput_ul_kbps',
+                  'prb_total_dl', 'prb_total_ul')
 
 class KPMDataCollector:
-    def __init__(self, output_dir=OUTPUT_DIR, duration=COLLECTION_DURATION):
+    def __init__(self, output_dir=OUTPUT_DIR, duration=COLLECTION_DURATION, verbose=False):
         self.output_dir = output_dir
         self.duration = duration
-        self.data = []
+        self.verbose = verbose  # echo every xApp output line
+        self.sample_count = 0
+        # Running [count, sum, max] per field; memory stays constant however
+        # long the collection runs (rows themselves are streamed to the CSV)
+        self.summary = {f: [0, 0, None] for f in SUMMARY_FIELDS}
         self.running = True
         self.csv_file = None
         self.csv_writer = None
@@ -45,8 +80,9 @@ class KPMDataCollector:
     def parse_kpm_output(self, line, current_record):
         """Parse a single line from xapp_kpm_moni output."""
         
-        # Parse KPM indication header
-        kpm_match = re.match(r'\s*(\d+)\s+KPM ind_msg latency = (\d+)', line)
+        # Parse KPM indication header. Cheap substring checks gate every
+        # regex below, since most xApp output lines match none of them.
+        kpm_match = 'KPM ind_msg' in line and KPM_HEADER_PATTERN.match(line)
         if kpm_match:
             if current_record.get('sample_id'):
                 self.save_record(current_record)
@@ -57,27 +93,19 @@ class KPMDataCollector:
             return current_record
         
         # Parse UE ID
-        ue_match = re.match(r'UE ID type = .*, amf_ue_ngap_id = (\d+)', line)
-        if ue_match:
-            current_record['ue_id'] = int(ue_match.group(1))
+        if 'amf_ue_ngap_id' in line:
+            ue_match = UE_ID_PATTERN.match(line)
+            if ue_match:
+                current_record['ue_id'] = int(ue_match.group(1))
+                return current_record
+
+        if 'DRB.' not in line and 'RRU.' not in line:
             return current_record
             
         # Parse metrics
-        metrics = [
-            (r'DRB\.PdcpSduVolumeDL = (\d+)', 'pdcp_sdu_volume_dl_kb'),
-            (r'DRB\.PdcpSduVolumeUL = (\d+)', 'pdcp_sdu_volume_ul_kb'),
-            (r'DRB\.RlcSduDelayDl = ([\d.]+)', 'rlc_sdu_delay_dl_us'),
-            (r'DRB\.UEThpDl = ([\d.]+)', 'ue_throughput_dl_kbps'),
-            (r'DRB\.UEThpUl = ([\d.]+)', 'ue_throughput_ul_kbps'),
-            (r'RRU\.PrbTotDl = (\d+)', 'prb_total_dl'),
-            (r'RRU\.PrbTotUl = (\d+)', 'prb_total_ul'),
-        ]
-        
-        for pattern, field_name in metrics:
-            match = re.search(pattern, line)
-            if match:
-                value = float(match.group(1))
-                current_record[field_name] = value
+        for match in METRIC_PATTERN.finditer(line):
+            field_name = match.lastgroup
+            current_record[field_name] = float(match.group(field_name))
                 
         return current_record
     
@@ -86,18 +114,19 @@ class KPMDataCollector:
         if not self.csv_writer:
             return
             
-        # Define expected fields with defaults
-        fields = [
-            'sample_id', 'timestamp', 'latency_us', 'ue_id',
-            'pdcp_sdu_volume_dl_kb', 'pdcp_sdu_volume_ul_kb',
-            'rlc_sdu_delay_dl_us', 'ue_throughput_dl_kbps', 
-            'ue_throughput_ul_kbps', 'prb_total_dl', 'prb_total_ul'
-        ]
-        
-        row = [record.get(f, 0) for f in fields]
+        row = [record.get(f, 0) for f in CSV_FIELDS]
         self.csv_writer.writerow(row)
-        self.csv_file.flush()
-        self.data.append(record.copy())
+        self.sample_count += 1
+        if self.sample_count % FLUSH_EVERY == 0:
+            self.csv_file.flush()
+        for f in SUMMARY_FIELDS:
+            if f in record:
+                value = record[f]
+                stats = self.summary[f]
+                stats[0] += 1
+                stats[1] += value
+                if stats[2] is None or value > stats[2]:
+                    stats[2] = value
         
     def collect(self):
         """Main collection loop."""
@@ -111,17 +140,12 @@ class KPMDataCollector:
         
         # Open CSV file
         self.csv_file = open(csv_path, 'w', newline='')
-        headers = [
-            'sample_id', 'timestamp', 'latency_us', 'ue_id',
-            'pdcp_sdu_volume_dl_kb', 'pdcp_sdu_volume_ul_kb',
-            'rlc_sdu_delay_dl_us', 'ue_throughput_dl_kbps',
-            'ue_throughput_ul_kbps', 'prb_total_dl', 'prb_total_ul'
-        ]
         self.csv_writer = csv.writer(self.csv_file)
-        self.csv_writer.writerow(headers)
+        self.csv_writer.writerow(CSV_FIELDS)
         
         start_time = time.time()
         current_record = {}
+        process = None
         
         try:
             # Start xApp process
@@ -129,68 +153,94 @@ class KPMDataCollector:
                 [XAPP_BINARY],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
+                bufsize=READ_CHUNK_SIZE
             )
             
+            # Read the pipe in large chunks and split lines in memory; a
+            # trailing partial line is carried over to the next read.
+            fd = process.stdout.fileno()
+            pending = b''
+            eof = False
             while self.running and (time.time() - start_time) < self.duration:
-                line = process.stdout.readline()
-                if not line:
+                # Don't block in read() while the xApp is silent, so Ctrl+C
+                # and the end of the collection window are noticed promptly
+                ready, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+                if not ready:
+                    continue
+                chunk = os.read(fd, READ_CHUNK_SIZE)
+                if not chunk:
+                    eof = True
                     break
                     
-                line = line.strip()
-                if line:
-                    # Print original output
-                    print(line)
-                    # Parse and save
-                    current_record = self.parse_kpm_output(line, current_record)
+                lines, _, pending = (pending + chunk).rpartition(b'\n')
+                for line in lines.decode(errors='replace').split('\n'):
+                    line = line.strip()
+                    if line:
+                        # Print original output
+                        if self.verbose:
+                            print(line)
+                        # Parse and save
+                        current_record = self.parse_kpm_output(line, current_record)
                     
+            # Parse a final line that had no trailing newline. Only at EOF:
+            # when stopped early, pending is a line cut mid-write.
+            line = pending.decode(errors='replace').strip() if eof else ''
+            if line:
+                if self.verbose:
+                    print(line)
+                current_record = self.parse_kpm_output(line, current_record)
+                
             # Save last record
             if current_record.get('sample_id'):
                 self.save_record(current_record)
                 
-            process.terminate()
-            process.wait(timeout=5)
-            
         except Exception as e:
             print(f"[Collector] Error: {e}")
         finally:
+            # Reap the xApp on every exit path, errors included
+            if process and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    process.kill()
             if self.csv_file:
                 self.csv_file.close()
                 
         print(f"\n[Collector] Collection complete!")
-        print(f"[Collector] Total samples collected: {len(self.data)}")
+        print(f"[Collector] Total samples collected: {self.sample_count}")
         print(f"[Collector] Dataset saved to: {csv_path}")
         
         return csv_path
 
 
 def main():
-    duration = int(sys.argv[1]) if len(sys.argv) > 1 else COLLECTION_DURATION
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else OUTPUT_DIR
+    verbose = '--verbose' in sys.argv[1:]
+    args = [a for a in sys.argv[1:] if a != '--verbose']
+    duration = int(args[0]) if len(args) > 0 else COLLECTION_DURATION
+    output_dir = args[1] if len(args) > 1 else OUTPUT_DIR
     
-    collector = KPMDataCollector(output_dir=output_dir, duration=duration)
+    collector = KPMDataCollector(output_dir=output_dir, duration=duration, verbose=verbose)
     csv_path = collector.collect()
     
     # Print summary statistics
-    if collector.data:
+    if collector.sample_count:
         print("\n" + "="*60)
         print("DATASET SUMMARY")
         print("="*60)
         
-        dl_thp = [d['ue_throughput_dl_kbps'] for d in collector.data if 'ue_throughput_dl_kbps' in d]
-        ul_thp = [d['ue_throughput_ul_kbps'] for d in collector.data if 'ue_throughput_ul_kbps' in d]
-        prb_dl = [d['prb_total_dl'] for d in collector.data if 'prb_total_dl' in d]
-        prb_ul = [d['prb_total_ul'] for d in collector.data if 'prb_total_ul' in d]
-        
-        if dl_thp:
-            print(f"DL Throughput: avg={sum(dl_thp)/len(dl_thp):.2f} kbps, max={max(dl_thp):.2f} kbps")
-        if ul_thp:
-            print(f"UL Throughput: avg={sum(ul_thp)/len(ul_thp):.2f} kbps, max={max(ul_thp):.2f} kbps")
-        if prb_dl:
-            print(f"PRB DL: avg={sum(prb_dl)/len(prb_dl):.1f}, max={max(prb_dl)}")
-        if prb_ul:
-            print(f"PRB UL: avg={sum(prb_ul)/len(prb_ul):.1f}, max={max(prb_ul)}")
+        n, total, peak = collector.summary['ue_throughput_dl_kbps']
+        if n:
+            print(f"DL Throughput: avg={total/n:.2f} kbps, max={peak:.2f} kbps")
+        n, total, peak = collector.summary['ue_throughput_ul_kbps']
+        if n:
+            print(f"UL Throughput: avg={total/n:.2f} kbps, max={peak:.2f} kbps")
+        n, total, peak = collector.summary['prb_total_dl']
+        if n:
+            print(f"PRB DL: avg={total/n:.1f}, max={peak}")
+        n, total, peak = collector.summary['prb_total_ul']
+        if n:
+            print(f"PRB UL: avg={total/n:.1f}, max={peak}")
 
 
 if __name__ == "__main__":
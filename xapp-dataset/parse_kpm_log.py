@@ -6,72 +6,103 @@ Parse KPM xApp raw output and convert to CSV dataset.
 import re
 import csv
 import sys
+import os
+import mmap
+import stat
+import contextlib
 from datetime import datetime
 
+WRITE_BUFFER_SIZE = 1 << 20  # CSV output is flushed to disk in 1 MiB writes
+
+# Output patterns of xapp_kpm_moni in one alternation, so the whole log is
+# scanned by a single finditer; the named group that matched is the field.
+# The header and UE id also consume the rest of their line, whose content
+# is not parsed.
+LOG_PATTERN = re.compile(
+    rb'^[ \t]*(?P<sample_id>\d+)[ \t]+KPM ind_msg latency[ \t]*=[ \t]*(?P<latency_us>\d+).*'
+    rb'|amf_ue_ngap_id[ \t]*=[ \t]*(?P<ue_id>\d+).*'
+    rb'|DRB\.PdcpSduVolumeDL[ \t]*=[ \t]*(?P<pdcp_sdu_volume_dl_kb>\d+)'
+    rb'|DRB\.PdcpSduVolumeUL[ \t]*=[ \t]*(?P<pdcp_sdu_volume_ul_kb>\d+)'
+    rb'|DRB\.RlcSduDelayDl[ \t]*=[ \t]*(?P<rlc_sdu_delay_dl_us>[\d.]+)'
+    rb'|DRB\.UEThpDl[ \t]*=[ \t]*(?P<ue_throughput_dl_kbps>[\d.]+)'
+    rb'|DRB\.UEThpUl[ \t]*=[ \t]*(?P<ue_throughput_ul_kbps>[\d.]+)'
+    rb'|RRU\.PrbTotDl[ \t]*=[ \t]*(?P<prb_total_dl>\d+)'
+    rb'|RRU\.PrbTotUl[ \t]*=[ \t]*(?P<prb_total_ul>\d+)',
+    re.MULTILINE
+)
+METRIC_TYPES = {
+    'pdcp_sdu_volume_dl_kb': int, 'pdcp_sdu_volume_ul_kb': int,
+    'rlc_sdu_delay_dl_us': float, 'ue_throughput_dl_kbps': float,
+    'ue_throughput_ul_kbps': float, 'prb_total_dl': int, 'prb_total_ul': int,
+}
+
+FIELDNAMES = [
+    'sample_id', 'timestamp', 'latency_us', 'ue_id',
+    'pdcp_sdu_volume_dl_kb', 'pdcp_sdu_volume_ul_kb',
+    'rlc_sdu_delay_dl_us', 'ue_throughput_dl_kbps',
+    'ue_throughput_ul_kbps', 'prb_total_dl', 'prb_total_ul'
+]
+
 def parse_kpm_log(input_file, output_file):
     """Parse KPM log file and create CSV dataset."""
     
-    records = []
+    count = 0
     current = {}
     
-    with open(input_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            
-            # Parse sample header
-            match = re.match(r'\s*(\d+)\s+KPM ind_msg latency\s*=\s*(\d+)', line)
-            if match:
-                if current.get('sample_id'):
-                    current['timestamp'] = datetime.now().isoformat()
-                    records.append(current.copy())
-                current = {
-                    'sample_id': int(match.group(1)),
-                    'latency_us': int(match.group(2))
-                }
-                continue
-            
-            # Parse UE ID
-            match = re.search(r'amf_ue_ngap_id\s*=\s*(\d+)', line)
-            if match:
-                current['ue_id'] = int(match.group(1))
-                continue
-            
-            # Parse metrics
-            patterns = [
-                (r'DRB\.PdcpSduVolumeDL\s*=\s*(\d+)', 'pdcp_sdu_volume_dl_kb', int),
-                (r'DRB\.PdcpSduVolumeUL\s*=\s*(\d+)', 'pdcp_sdu_volume_ul_kb', int),
-                (r'DRB\.RlcSduDelayDl\s*=\s*([\d.]+)', 'rlc_sdu_delay_dl_us', float),
-                (r'DRB\.UEThpDl\s*=\s*([\d.]+)', 'ue_throughput_dl_kbps', float),
-                (r'DRB\.UEThpUl\s*=\s*([\d.]+)', 'ue_throughput_ul_kbps', float),
-                (r'RRU\.PrbTotDl\s*=\s*(\d+)', 'prb_total_dl', int),
-                (r'RRU\.PrbTotUl\s*=\s*(\d+)', 'prb_total_ul', int),
-            ]
-            
-            for pattern, field, converter in patterns:
-                match = re.search(pattern, line)
-                if match:
-                    current[field] = converter(match.group(1))
+    with open(input_file, 'rb') as f:
+        # Map a regular file in place. A pipe or FIFO (/dev/stdin,
+        # <(kubectl logs ...)) can't be mapped, so it is read whole.
+        st = os.fstat(f.fileno())
+        if not stat.S_ISREG(st.st_mode):
+            log = contextlib.nullcontext(f.read())
+        elif st.st_size:
+            log = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            return count  # An empty log holds no records (and can't be mapped)
     
-    # Don't forget last record
-    if current.get('sample_id'):
-        current['timestamp'] = datetime.now().isoformat()
-        records.append(current)
+    # Records are written out as they complete rather than kept in memory.
+    # Rows are positional: no per-row dict lookups against FIELDNAMES.
+    # They go to a temporary file that replaces output_file only once the
+    # log has yielded records, so an existing file is never clobbered by an
+    # empty or failed parse.
+    tmp_file = output_file + '.tmp'
+    try:
+        with log as data, \
+                open(tmp_file, 'w', newline='', buffering=WRITE_BUFFER_SIZE) as out:
+            writer = csv.writer(out)
+            writer.writerow(FIELDNAMES)
+            for match in LOG_PATTERN.finditer(data):
+                field = match.lastgroup
+                if field == 'latency_us':  # sample header
+                    if current.get('sample_id'):
+                        current['timestamp'] = datetime.now().isoformat()
+                        writer.writerow([current.get(k, '') for k in FIELDNAMES])
+                        count += 1
+                    current = {
+                        'sample_id': int(match.group('sample_id')),
+                        'latency_us': int(match.group('latency_us'))
+                    }
+                elif field == 'ue_id':
+                    current['ue_id'] = int(match.group('ue_id'))
+                else:  # KPI
+                    current[field] = METRIC_TYPES[field](match.group(field))
+            
+            # Don't forget last record
+            if current.get('sample_id'):
+                current['timestamp'] = datetime.now().isoformat()
+                writer.writerow([current.get(k, '') for k in FIELDNAMES])
+                count += 1
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
     
-    # Write CSV
-    if records:
-        fieldnames = [
-            'sample_id', 'timestamp', 'latency_us', 'ue_id',
-            'pdcp_sdu_volume_dl_kb', 'pdcp_sdu_volume_ul_kb',
-            'rlc_sdu_delay_dl_us', 'ue_throughput_dl_kbps',
-            'ue_throughput_ul_kbps', 'prb_total_dl', 'prb_total_ul'
-        ]
-        
-        with open(output_file, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-            writer.writeheader()
-            writer.writerows(records)
+    if count:
+        os.replace(tmp_file, output_file)
+    else:
+        os.remove(tmp_file)
     
-    return len(records)
+    return count
 
 
 def main():